@@ -1,25 +1,500 @@
-from fastapi import FastAPI, HTTPException, Query
-from motor.motor_asyncio import AsyncIOMotorClient
+import argparse
+import asyncio
+import logging
+import re
+
+import orjson
+from fastapi import Body, Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+from redis import asyncio as aioredis
+from pymongo import AsyncMongoClient, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, ExecutionTimeout, PyMongoError
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic_core import core_schema
+from typing import Literal, Optional, List
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, timezone
 
-app = FastAPI(title="Football API", description="API for football data management")
+logger = logging.getLogger(__name__)
+
+
+# JSON encoding straight from MongoDB documents (ObjectId, naive UTC datetimes)
+def json_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError
+
+
+def dumps(content):
+    return orjson.dumps(content, default=json_default, option=orjson.OPT_NAIVE_UTC)
+
+
+class MongoJSONResponse(ORJSONResponse):
+    """ORJSONResponse that also encodes ObjectId values."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+app = FastAPI(
+    title="Football API",
+    description="API for football data management",
+    default_response_class=MongoJSONResponse,
+)
 
 # MongoDB connection
 MONGO_URL = "mongodb://localhost:27017"
-client = AsyncIOMotorClient(MONGO_URL)
-db = client.football
+REDIS_URL = "redis://localhost"
+REDIS_TIMEOUT = 0.5
+CACHE_EXPIRE = 60
+MAX_CACHED_BODY = 1024 * 1024
+QUERY_TIMEOUT_MS = 3000
+TEST_DATA_TTL = 86400
+BACKFILL_BATCH = 1000
+MAX_BULK_INSERT = 1000
+# Search fields are normally filled by the backfill-search-fields migration
+BACKFILL_ON_STARTUP = False
+CACHE_NAMESPACES = ("players", "teams", "matches")
+client: Optional[AsyncMongoClient] = None
+db = None
+cache_redis = None
+
+
+@app.on_event("startup")
+async def connect_db():
+    """Open the MongoDB connection pool and warm it before serving requests."""
+    global client, db, cache_redis
+    client = AsyncMongoClient(
+        MONGO_URL,
+        maxPoolSize=100,
+        minPoolSize=10,
+        maxIdleTimeMS=30000,
+        serverSelectionTimeoutMS=5000,
+        connectTimeoutMS=5000,
+        waitQueueTimeoutMS=5000,
+    )
+    db = client.football
+    try:
+        # AsyncMongoClient connects lazily; open the pool now so the first request doesn't pay for it
+        await client.aconnect()
+        await client.admin.command("ping")
+    except PyMongoError:
+        logger.warning("MongoDB unreachable at startup, connecting on first use", exc_info=True)
+    # Short timeouts: a hung Redis must degrade to uncached requests, not block them
+    cache_redis = aioredis.from_url(
+        REDIS_URL,
+        socket_timeout=REDIS_TIMEOUT,
+        socket_connect_timeout=REDIS_TIMEOUT,
+    )
+    FastAPICache.init(
+        RedisBackend(cache_redis),
+        prefix="football",
+    )
+    app.state.index_task = asyncio.create_task(ensure_indexes(), name="ensure_indexes")
+    app.state.index_task.add_done_callback(log_task_failure)
+
+
+def log_task_failure(task):
+    """Report the exception of a background startup task instead of dropping it."""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task %s failed", task.get_name(), exc_info=task.exception())
+
+
+async def ensure_indexes():
+    """Create indexes matching the filters used by the list endpoints.
+
+    Test documents also get a TTL index on created_at, so MongoDB purges
+    them in the background after TEST_DATA_TTL seconds. Each collection is
+    indexed independently, so one failure does not skip the others.
+    """
+    test_data_ttl = IndexModel(
+        [("created_at", 1)],
+        expireAfterSeconds=TEST_DATA_TTL,
+        partialFilterExpression={"is_test": True},
+    )
+    indexes = {
+        "players": [
+            IndexModel([("name_lc", 1)]),
+            IndexModel([("position_lc", 1)]),
+            IndexModel([("team_id", 1)]),
+            IndexModel([("nationality_lc", 1)]),
+            IndexModel([("age", 1)]),
+            IndexModel([("is_test", 1)]),
+            test_data_ttl,
+        ],
+        "teams": [
+            IndexModel([("name_lc", 1)]),
+            IndexModel([("country_lc", 1)]),
+            IndexModel([("league_lc", 1)]),
+            IndexModel([("is_test", 1)]),
+            test_data_ttl,
+        ],
+        "matches": [
+            IndexModel([("home_team_id", 1), ("date", -1)]),
+            IndexModel([("away_team_id", 1), ("date", -1)]),
+            IndexModel([("date", -1)]),
+            IndexModel([("stadium_lc", 1)]),
+            IndexModel([("is_test", 1)]),
+            test_data_ttl,
+        ],
+    }
+    results = await asyncio.gather(
+        *(db[collection].create_indexes(models) for collection, models in indexes.items()),
+        return_exceptions=True,
+    )
+    for collection, result in zip(indexes, results):
+        if isinstance(result, Exception):
+            logger.error("Creating indexes on %s failed", collection, exc_info=result)
+    if BACKFILL_ON_STARTUP:
+        await backfill_search_fields(db)
+
+
+async def backfill_search_fields(database, refresh=False):
+    """Set the lowercase search fields on documents written outside the API.
+
+    Values are lowercased in Python, like the API writes and queries do, since
+    MongoDB's $toLower only handles ASCII. By default only documents missing a
+    search field are touched; refresh=True recomputes every document.
+    """
+    for collection, fields in SEARCH_FIELDS.items():
+        if refresh:
+            query = {"$or": [{f: {"$type": "string"}} for f in fields]}
+        else:
+            query = {"$or": [{f + "_lc": {"$exists": False}, f: {"$type": "string"}} for f in fields]}
+        requests = []
+        async for doc in database[collection].find(query, dict.fromkeys(fields, 1)):
+            requests.append(UpdateOne({"_id": doc["_id"]}, {"$set": search_fields(doc, collection)}))
+            if len(requests) == BACKFILL_BATCH:
+                await database[collection].bulk_write(requests, ordered=False)
+                requests = []
+        if requests:
+            await database[collection].bulk_write(requests, ordered=False)
+
+
+@app.exception_handler(ExecutionTimeout)
+async def query_timeout_handler(request, exc):
+    """Report queries aborted by maxTimeMS as a gateway timeout."""
+    return MongoJSONResponse({"detail": "Query timed out"}, status_code=504)
+
+
+@app.on_event("shutdown")
+async def close_db():
+    """Close the MongoDB connection pool and the Redis cache connection."""
+    if client is not None:
+        await client.close()
+    if cache_redis is not None:
+        await cache_redis.close()
+
+
+def now_utc() -> datetime:
+    """Request timestamp, resolved once per request."""
+    return datetime.now(timezone.utc)
+
+
+class PyObjectId(ObjectId):
+    """ObjectId parsed and validated by pydantic, documented as a 24-character hex string."""
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        return core_schema.no_info_plain_validator_function(cls.validate)
+
+    @classmethod
+    def __get_pydantic_json_schema__(cls, schema, handler):
+        return {"type": "string", "pattern": "^[0-9a-fA-F]{24}$"}
+
+    @classmethod
+    def validate(cls, value):
+        if isinstance(value, ObjectId):
+            return value
+        if not ObjectId.is_valid(value):
+            raise ValueError("Invalid ObjectId")
+        return ObjectId(value)
+
+
+async def stream_json(first, cursor, cache_key):
+    """Write the cursor out as a JSON array, caching the full body once sent.
+
+    cache_key carries the namespace generation read before the query ran, so a
+    write that invalidates the namespace mid-stream leaves this body under a
+    key that is no longer read. Bodies over MAX_CACHED_BODY are not buffered
+    or cached, keeping large pages streaming in constant memory. The cursor is
+    closed even if the client disconnects before the body is complete.
+
+    List cursors fetch the whole page in their first batch, but a page over
+    the 16MB batch limit still needs a getMore that can fail once the 200 has
+    been sent. The error is logged and the array left unterminated, so the
+    client cannot mistake the truncated body for a complete page.
+    """
+    chunks = [b"["] if first is None else [b"[" + dumps(first)]
+    size = len(chunks[0])
+    try:
+        yield chunks[0]
+        if first is not None:
+            async for doc in cursor:
+                chunk = b"," + dumps(doc)
+                if chunks is not None:
+                    size += len(chunk)
+                    if size <= MAX_CACHED_BODY:
+                        chunks.append(chunk)
+                    else:
+                        chunks = None
+                yield chunk
+    except PyMongoError:
+        logger.error("List query failed after the response started", exc_info=True)
+        return
+    finally:
+        await cursor.close()
+    yield b"]"
+    if cache_key is None or chunks is None:
+        return
+    chunks.append(b"]")
+    await store_cached(cache_key, b"".join(chunks))
+
+
+async def namespace_version(namespace):
+    """Versioned key prefix of a cache namespace, or None if Redis is unavailable.
+
+    Invalidation bumps the namespace generation, so old entries are never read
+    again and simply expire.
+    """
+    try:
+        generation = await cache_redis.get(namespace + ":generation")
+    except Exception:
+        logger.warning("Error reading generation of cache namespace '%s'", namespace, exc_info=True)
+        return None
+    return f"{namespace}:{int(generation or 0)}"
+
+
+def cache_directives(request):
+    return {d.strip().lower() for d in request.headers.get("Cache-Control", "").split(",")}
+
+
+async def cached_response(request, namespace):
+    """Look up a cached GET response; returns its cache key and the response or None.
+
+    Follows fastapi-cache's rules: nothing is read or stored when caching is
+    disabled or the request sends Cache-Control: no-store, and no-cache skips
+    the lookup but refreshes the entry. The cache key is None when the
+    response must not be stored, including when Redis is unavailable.
+    """
+    directives = cache_directives(request)
+    if not FastAPICache.get_enable() or "no-store" in directives:
+        return None, None
+    versioned = await namespace_version(f"{FastAPICache.get_prefix()}:{namespace}")
+    if versioned is None:
+        return None, None
+    cache_key = f"{versioned}:{request.url.path}?{request.url.query}"
+    if "no-cache" in directives:
+        return cache_key, None
+    try:
+        cached = await FastAPICache.get_backend().get(cache_key)
+    except Exception:
+        logger.warning("Error retrieving cache key '%s'", cache_key, exc_info=True)
+        cached = None
+    if cached is None:
+        return cache_key, None
+    headers = {FastAPICache.get_cache_status_header(): "HIT"}
+    return cache_key, Response(content=cached, media_type="application/json", headers=headers)
+
+
+async def store_cached(cache_key, body):
+    try:
+        await FastAPICache.get_backend().set(cache_key, body, CACHE_EXPIRE)
+    except Exception:
+        logger.warning("Error setting cache key '%s'", cache_key, exc_info=True)
+
+
+async def cache_response(cache_key, response):
+    """Store a rendered response under cache_key, unless caching was skipped."""
+    if cache_key is not None:
+        response.headers[FastAPICache.get_cache_status_header()] = "MISS"
+        await store_cached(cache_key, response.body)
+    return response
+
+
+async def list_response(cursor, cache_key):
+    """Stream a list endpoint from the cursor, caching it under cache_key.
+
+    The first document is fetched up front so query errors such as a
+    maxTimeMS timeout are raised before the response has started.
+    """
+    try:
+        first = await cursor.next()
+    except StopAsyncIteration:
+        first = None
+    response = StreamingResponse(stream_json(first, cursor, cache_key), media_type="application/json")
+    if cache_key is not None:
+        response.headers[FastAPICache.get_cache_status_header()] = "MISS"
+    return response
+
+
+async def invalidate_cache(*namespaces):
+    """Drop cached GET responses for the given collections, or all of them.
 
+    Bumps each namespace generation with a single INCR. Errors are logged,
+    as the write they follow has already been committed.
+    """
+    try:
+        async with cache_redis.pipeline(transaction=False) as pipe:
+            for namespace in namespaces or CACHE_NAMESPACES:
+                pipe.incr(f"{FastAPICache.get_prefix()}:{namespace}:generation")
+            await pipe.execute()
+    except Exception:
+        logger.warning("Error invalidating cache namespaces %s", namespaces, exc_info=True)
+
+
+# Shared, never-mutated query fragments
+ID_ONLY = {"_id": 1}
+TEST_DATA = {"is_test": True}
+
+
+# String fields filtered by prefix, stored lowercased in a "<field>_lc" shadow field
+SEARCH_FIELDS = {
+    "players": ("name", "position", "nationality"),
+    "teams": ("name", "country", "league"),
+    "matches": ("stadium",),
+}
+
+
+# List endpoint filters: (query parameter, document field, operator)
+PLAYER_FILTERS = [
+    ("name", "name_lc", "prefix"),
+    ("position", "position_lc", "prefix"),
+    ("team_id", "team_id", "eq"),
+    ("nationality", "nationality_lc", "prefix"),
+    ("min_age", "age", "$gte"),
+    ("max_age", "age", "$lte"),
+    ("is_test", "is_test", "eq"),
+]
+TEAM_FILTERS = [
+    ("name", "name_lc", "prefix"),
+    ("country", "country_lc", "prefix"),
+    ("league", "league_lc", "prefix"),
+    ("is_test", "is_test", "eq"),
+]
+MATCH_FILTERS = [
+    ("home_team_id", "home_team_id", "eq"),
+    ("away_team_id", "away_team_id", "eq"),
+    ("team_id", ("home_team_id", "away_team_id"), "any"),
+    ("stadium", "stadium_lc", "prefix"),
+    ("date_from", "date", "$gte"),
+    ("date_to", "date", "$lte"),
+    ("is_test", "is_test", "eq"),
+]
+
+
+# Internal search fields, never returned to clients
+HIDDEN_FIELDS = {
+    collection: {f + "_lc": 0 for f in fields}
+    for collection, fields in SEARCH_FIELDS.items()
+}
+
+# Fields left out of list responses unless explicitly requested
+SUMMARY_PROJECTIONS = {
+    collection: {**hidden, "created_at": 0, "updated_at": 0}
+    for collection, hidden in HIDDEN_FIELDS.items()
+}
+
+
+def search_fields(doc, collection):
+    """Lowercase shadow fields for the searchable strings present in doc."""
+    return {
+        field + "_lc": doc[field].lower()
+        for field in SEARCH_FIELDS[collection]
+        if isinstance(doc.get(field), str)
+    }
 
-# Helper to convert ObjectId to string
-def serialize_doc(doc):
-    if doc:
-        doc["_id"] = str(doc["_id"])
+
+def add_search_fields(doc, collection):
+    """Set the lowercase shadow fields for the searchable strings present in doc."""
+    doc.update(search_fields(doc, collection))
     return doc
 
 
+def list_projection(fields, collection):
+    """Projection for list endpoints: the requested CSV fields, else the summary view."""
+    if not fields:
+        return SUMMARY_PROJECTIONS[collection]
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - LIST_FIELDS[collection]
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return dict.fromkeys(requested, 1)
+
+
+async def insert_bulk(collection, docs, *namespaces):
+    """Insert docs unordered and invalidate namespaces, reporting partial failures.
+
+    Documents that fail (e.g. on a duplicate key) don't stop the rest, so on a
+    BulkWriteError the IDs that were inserted are returned with a 409 next to
+    the per-document errors.
+    """
+    try:
+        result = await db[collection].insert_many(docs, ordered=False)
+    except BulkWriteError as exc:
+        await invalidate_cache(*namespaces)
+        write_errors = exc.details.get("writeErrors", [])
+        failed = {error["index"] for error in write_errors}
+        return MongoJSONResponse(
+            {
+                "inserted_ids": [doc["_id"] for i, doc in enumerate(docs) if i not in failed],
+                "errors": [
+                    {"index": error["index"], "code": error.get("code"), "detail": error.get("errmsg")}
+                    for error in write_errors
+                ],
+            },
+            status_code=409,
+        )
+    await invalidate_cache(*namespaces)
+    return MongoJSONResponse(result.inserted_ids, status_code=201)
+
+
+def build_query(filters, **params):
+    """Build a MongoDB filter from the list endpoint parameters that were given."""
+    query = {}
+    for param, field, op in filters:
+        value = params[param]
+        if value is None or value == "":
+            continue
+        if op == "eq":
+            query[field] = value
+        elif op == "prefix":
+            query[field] = prefix_match(value)
+        elif op == "any":
+            query["$or"] = [{f: value} for f in field]
+        else:
+            bounds = query.get(field)
+            if bounds is None:
+                query[field] = {op: value}
+            else:
+                bounds[op] = value
+    return query
+
+
+def team_lookup(id_field, as_field):
+    """Aggregation stages embedding the team referenced by a string ID field."""
+    team_oid = {"$convert": {"input": "$" + id_field, "to": "objectId", "onError": None, "onNull": None}}
+    return [
+        {"$lookup": {
+            "from": "teams",
+            "let": {"team_oid": team_oid},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$team_oid"]}}},
+                {"$project": SUMMARY_PROJECTIONS["teams"]},
+            ],
+            "as": as_field,
+        }},
+        {"$set": {as_field: {"$arrayElemAt": ["$" + as_field, 0]}}},
+    ]
+
+
+def prefix_match(value):
+    """Build an anchored, case-sensitive regex usable on a lowercase indexed field."""
+    return {"$regex": "^" + re.escape(value.lower())}
+
+
 # =============================================================================
 # MODELS
 # =============================================================================
@@ -72,12 +547,22 @@ class MatchUpdate(BaseModel):
     stadium: Optional[str] = None
 
 
+# Fields that list endpoints accept in their `fields` parameter
+STORED_FIELDS = {"_id", "is_test", "created_at", "updated_at"}
+LIST_FIELDS = {
+    "players": {*STORED_FIELDS, *PlayerCreate.model_fields},
+    "teams": {*STORED_FIELDS, *TeamCreate.model_fields},
+    "matches": {*STORED_FIELDS, "home_team", "away_team", *MatchCreate.model_fields},
+}
+
+
 # =============================================================================
 # PLAYERS ENDPOINTS
 # =============================================================================
 
 @app.get("/players", response_model=List[dict])
 async def get_players(
+    request: Request,
     name: Optional[str] = Query(None, description="Filter by player name"),
     position: Optional[str] = Query(None, description="Filter by position"),
     team_id: Optional[str] = Query(None, description="Filter by team ID"),
@@ -85,90 +570,105 @@ async def get_players(
     min_age: Optional[int] = Query(None, description="Minimum age"),
     max_age: Optional[int] = Query(None, description="Maximum age"),
     is_test: Optional[bool] = Query(None, description="Filter test data only"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
     limit: int = Query(100, ge=1, le=1000),
     skip: int = Query(0, ge=0)
 ):
     """Get all players with optional filters."""
-    query = {}
-    if name:
-        query["name"] = {"$regex": name, "$options": "i"}
-    if position:
-        query["position"] = {"$regex": position, "$options": "i"}
-    if team_id:
-        query["team_id"] = team_id
-    if nationality:
-        query["nationality"] = {"$regex": nationality, "$options": "i"}
-    if min_age is not None:
-        query["age"] = {"$gte": min_age}
-    if max_age is not None:
-        query.setdefault("age", {})["$lte"] = max_age
-    if is_test is not None:
-        query["is_test"] = is_test
-
-    cursor = db.players.find(query).skip(skip).limit(limit)
-    players = await cursor.to_list(length=limit)
-    return [serialize_doc(p) for p in players]
+    cache_key, cached = await cached_response(request, "players")
+    if cached is not None:
+        return cached
+
+    query = build_query(
+        PLAYER_FILTERS,
+        name=name,
+        position=position,
+        team_id=team_id,
+        nationality=nationality,
+        min_age=min_age,
+        max_age=max_age,
+        is_test=is_test,
+    )
+
+    cursor = db.players.find(query, list_projection(fields, "players")).max_time_ms(QUERY_TIMEOUT_MS).skip(skip).limit(limit).batch_size(limit)
+    return await list_response(cursor, cache_key)
 
 
 @app.get("/players/{player_id}")
-async def get_player(player_id: str):
+async def get_player(request: Request, player_id: PyObjectId):
     """Get a single player by ID."""
-    try:
-        player = await db.players.find_one({"_id": ObjectId(player_id)})
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid player ID format")
+    cache_key, cached = await cached_response(request, "players")
+    if cached is not None:
+        return cached
+
+    player = await db.players.find_one({"_id": player_id}, HIDDEN_FIELDS["players"])
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
-    return serialize_doc(player)
+    return await cache_response(cache_key, MongoJSONResponse(player))
 
 
 @app.post("/players", status_code=201)
-async def create_player(player: PlayerCreate):
+async def create_player(player: PlayerCreate, created_at: datetime = Depends(now_utc)):
     """Create a new test player. is_test=True is automatically set."""
     player_dict = player.model_dump()
     player_dict["is_test"] = True
-    player_dict["created_at"] = datetime.utcnow()
-    result = await db.players.insert_one(player_dict)
-    player_dict["_id"] = str(result.inserted_id)
-    return player_dict
+    player_dict["created_at"] = created_at
+    result = await db.players.insert_one({**player_dict, **search_fields(player_dict, "players")})
+    player_dict["_id"] = result.inserted_id
+    await invalidate_cache("players")
+    return MongoJSONResponse(player_dict, status_code=201)
 
 
-@app.put("/players/{player_id}")
-async def update_player(player_id: str, player: PlayerUpdate):
-    """Update a player. Only test data can be modified."""
-    try:
-        existing = await db.players.find_one({"_id": ObjectId(player_id)})
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid player ID format")
+@app.post("/players/bulk", status_code=201)
+async def create_players_bulk(
+    players: List[PlayerCreate] = Body(..., min_length=1, max_length=MAX_BULK_INSERT),
+    created_at: datetime = Depends(now_utc),
+):
+    """Create several test players at once. is_test=True is automatically set."""
+    docs = [
+        {**add_search_fields(player.model_dump(), "players"), "is_test": True, "created_at": created_at}
+        for player in players
+    ]
+    return await insert_bulk("players", docs, "players")
 
-    if not existing:
-        raise HTTPException(status_code=404, detail="Player not found")
-    if not existing.get("is_test"):
-        raise HTTPException(status_code=403, detail="Cannot modify real data. Only test data can be updated.")
 
-    update_data = {k: v for k, v in player.model_dump().items() if v is not None}
+@app.put("/players/{player_id}")
+async def update_player(
+    player_id: PyObjectId,
+    player: PlayerUpdate,
+    updated_at: datetime = Depends(now_utc),
+):
+    """Update a player. Only test data can be modified."""
+    update_data = player.model_dump(exclude_unset=True, exclude_none=True)
     if update_data:
-        update_data["updated_at"] = datetime.utcnow()
-        await db.players.update_one({"_id": ObjectId(player_id)}, {"$set": update_data})
-
-    updated = await db.players.find_one({"_id": ObjectId(player_id)})
-    return serialize_doc(updated)
+        add_search_fields(update_data, "players")
+        update_data["updated_at"] = updated_at
+        updated = await db.players.find_one_and_update(
+            {"_id": player_id, "is_test": True},
+            {"$set": update_data},
+            projection=HIDDEN_FIELDS["players"],
+            return_document=ReturnDocument.AFTER,
+        )
+    else:
+        updated = await db.players.find_one({"_id": player_id, "is_test": True}, HIDDEN_FIELDS["players"])
+
+    if not updated:
+        if not await db.players.find_one({"_id": player_id}, ID_ONLY):
+            raise HTTPException(status_code=404, detail="Player not found")
+        raise HTTPException(status_code=403, detail="Cannot modify real data. Only test data can be updated.")
+    await invalidate_cache("players")
+    return MongoJSONResponse(updated)
 
 
 @app.delete("/players/{player_id}")
-async def delete_player(player_id: str):
+async def delete_player(player_id: PyObjectId):
     """Delete a player. Only test data can be deleted."""
-    try:
-        existing = await db.players.find_one({"_id": ObjectId(player_id)})
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid player ID format")
-
-    if not existing:
-        raise HTTPException(status_code=404, detail="Player not found")
-    if not existing.get("is_test"):
+    deleted = await db.players.find_one_and_delete({"_id": player_id, "is_test": True}, ID_ONLY)
+    if not deleted:
+        if not await db.players.find_one({"_id": player_id}, ID_ONLY):
+            raise HTTPException(status_code=404, detail="Player not found")
         raise HTTPException(status_code=403, detail="Cannot delete real data. Only test data can be deleted.")
-
-    await db.players.delete_one({"_id": ObjectId(player_id)})
+    await invalidate_cache("players")
     return {"message": "Player deleted successfully"}
 
 
@@ -178,88 +678,107 @@ async def delete_player(player_id: str):
 
 @app.get("/teams", response_model=List[dict])
 async def get_teams(
+    request: Request,
     name: Optional[str] = Query(None, description="Filter by team name"),
     country: Optional[str] = Query(None, description="Filter by country"),
     league: Optional[str] = Query(None, description="Filter by league"),
     is_test: Optional[bool] = Query(None, description="Filter test data only"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
     limit: int = Query(100, ge=1, le=1000),
     skip: int = Query(0, ge=0)
 ):
     """Get all teams with optional filters."""
-    query = {}
-    if name:
-        query["name"] = {"$regex": name, "$options": "i"}
-    if country:
-        query["country"] = {"$regex": country, "$options": "i"}
-    if league:
-        query["league"] = {"$regex": league, "$options": "i"}
-    if is_test is not None:
-        query["is_test"] = is_test
+    cache_key, cached = await cached_response(request, "teams")
+    if cached is not None:
+        return cached
+
+    query = build_query(
+        TEAM_FILTERS,
+        name=name,
+        country=country,
+        league=league,
+        is_test=is_test,
+    )
 
-    cursor = db.teams.find(query).skip(skip).limit(limit)
-    teams = await cursor.to_list(length=limit)
-    return [serialize_doc(t) for t in teams]
+    cursor = db.teams.find(query, list_projection(fields, "teams")).max_time_ms(QUERY_TIMEOUT_MS).skip(skip).limit(limit).batch_size(limit)
+    return await list_response(cursor, cache_key)
 
 
 @app.get("/teams/{team_id}")
-async def get_team(team_id: str):
+async def get_team(request: Request, team_id: PyObjectId):
     """Get a single team by ID."""
-    try:
-        team = await db.teams.find_one({"_id": ObjectId(team_id)})
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid team ID format")
+    cache_key, cached = await cached_response(request, "teams")
+    if cached is not None:
+        return cached
+
+    team = await db.teams.find_one({"_id": team_id}, HIDDEN_FIELDS["teams"])
     if not team:
         raise HTTPException(status_code=404, detail="Team not found")
-    return serialize_doc(team)
+    return await cache_response(cache_key, MongoJSONResponse(team))
 
 
 @app.post("/teams", status_code=201)
-async def create_team(team: TeamCreate):
+async def create_team(team: TeamCreate, created_at: datetime = Depends(now_utc)):
     """Create a new test team. is_test=True is automatically set."""
     team_dict = team.model_dump()
     team_dict["is_test"] = True
-    team_dict["created_at"] = datetime.utcnow()
-    result = await db.teams.insert_one(team_dict)
-    team_dict["_id"] = str(result.inserted_id)
-    return team_dict
+    team_dict["created_at"] = created_at
+    result = await db.teams.insert_one({**team_dict, **search_fields(team_dict, "teams")})
+    team_dict["_id"] = result.inserted_id
+    await invalidate_cache("teams", "matches")
+    return MongoJSONResponse(team_dict, status_code=201)
 
 
-@app.put("/teams/{team_id}")
-async def update_team(team_id: str, team: TeamUpdate):
-    """Update a team. Only test data can be modified."""
-    try:
-        existing = await db.teams.find_one({"_id": ObjectId(team_id)})
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid team ID format")
+@app.post("/teams/bulk", status_code=201)
+async def create_teams_bulk(
+    teams: List[TeamCreate] = Body(..., min_length=1, max_length=MAX_BULK_INSERT),
+    created_at: datetime = Depends(now_utc),
+):
+    """Create several test teams at once. is_test=True is automatically set."""
+    docs = [
+        {**add_search_fields(team.model_dump(), "teams"), "is_test": True, "created_at": created_at}
+        for team in teams
+    ]
+    return await insert_bulk("teams", docs, "teams", "matches")
 
-    if not existing:
-        raise HTTPException(status_code=404, detail="Team not found")
-    if not existing.get("is_test"):
-        raise HTTPException(status_code=403, detail="Cannot modify real data. Only test data can be updated.")
 
-    update_data = {k: v for k, v in team.model_dump().items() if v is not None}
+@app.put("/teams/{team_id}")
+async def update_team(
+    team_id: PyObjectId,
+    team: TeamUpdate,
+    updated_at: datetime = Depends(now_utc),
+):
+    """Update a team. Only test data can be modified."""
+    update_data = team.model_dump(exclude_unset=True, exclude_none=True)
     if update_data:
-        update_data["updated_at"] = datetime.utcnow()
-        await db.teams.update_one({"_id": ObjectId(team_id)}, {"$set": update_data})
-
-    updated = await db.teams.find_one({"_id": ObjectId(team_id)})
-    return serialize_doc(updated)
+        add_search_fields(update_data, "teams")
+        update_data["updated_at"] = updated_at
+        updated = await db.teams.find_one_and_update(
+            {"_id": team_id, "is_test": True},
+            {"$set": update_data},
+            projection=HIDDEN_FIELDS["teams"],
+            return_document=ReturnDocument.AFTER,
+        )
+    else:
+        updated = await db.teams.find_one({"_id": team_id, "is_test": True}, HIDDEN_FIELDS["teams"])
+
+    if not updated:
+        if not await db.teams.find_one({"_id": team_id}, ID_ONLY):
+            raise HTTPException(status_code=404, detail="Team not found")
+        raise HTTPException(status_code=403, detail="Cannot modify real data. Only test data can be updated.")
+    await invalidate_cache("teams", "matches")
+    return MongoJSONResponse(updated)
 
 
 @app.delete("/teams/{team_id}")
-async def delete_team(team_id: str):
+async def delete_team(team_id: PyObjectId):
     """Delete a team. Only test data can be deleted."""
-    try:
-        existing = await db.teams.find_one({"_id": ObjectId(team_id)})
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid team ID format")
-
-    if not existing:
-        raise HTTPException(status_code=404, detail="Team not found")
-    if not existing.get("is_test"):
+    deleted = await db.teams.find_one_and_delete({"_id": team_id, "is_test": True}, ID_ONLY)
+    if not deleted:
+        if not await db.teams.find_one({"_id": team_id}, ID_ONLY):
+            raise HTTPException(status_code=404, detail="Team not found")
         raise HTTPException(status_code=403, detail="Cannot delete real data. Only test data can be deleted.")
-
-    await db.teams.delete_one({"_id": ObjectId(team_id)})
+    await invalidate_cache("teams", "matches")
     return {"message": "Team deleted successfully"}
 
 
@@ -269,6 +788,7 @@ async def delete_team(team_id: str):
 
 @app.get("/matches", response_model=List[dict])
 async def get_matches(
+    request: Request,
     home_team_id: Optional[str] = Query(None, description="Filter by home team ID"),
     away_team_id: Optional[str] = Query(None, description="Filter by away team ID"),
     team_id: Optional[str] = Query(None, description="Filter by any team (home or away)"),
@@ -276,90 +796,120 @@ async def get_matches(
     date_from: Optional[datetime] = Query(None, description="Filter matches from this date"),
     date_to: Optional[datetime] = Query(None, description="Filter matches until this date"),
     is_test: Optional[bool] = Query(None, description="Filter test data only"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    expand: Optional[Literal["teams"]] = Query(None, description="Embed home_team and away_team"),
     limit: int = Query(100, ge=1, le=1000),
     skip: int = Query(0, ge=0)
 ):
     """Get all matches with optional filters."""
-    query = {}
-    if home_team_id:
-        query["home_team_id"] = home_team_id
-    if away_team_id:
-        query["away_team_id"] = away_team_id
-    if team_id:
-        query["$or"] = [{"home_team_id": team_id}, {"away_team_id": team_id}]
-    if stadium:
-        query["stadium"] = {"$regex": stadium, "$options": "i"}
-    if date_from:
-        query["date"] = {"$gte": date_from}
-    if date_to:
-        query.setdefault("date", {})["$lte"] = date_to
-    if is_test is not None:
-        query["is_test"] = is_test
-
-    cursor = db.matches.find(query).skip(skip).limit(limit)
-    matches = await cursor.to_list(length=limit)
-    return [serialize_doc(m) for m in matches]
+    cache_key, cached = await cached_response(request, "matches")
+    if cached is not None:
+        return cached
+
+    query = build_query(
+        MATCH_FILTERS,
+        home_team_id=home_team_id,
+        away_team_id=away_team_id,
+        team_id=team_id,
+        stadium=stadium,
+        date_from=date_from,
+        date_to=date_to,
+        is_test=is_test,
+    )
+
+    projection = list_projection(fields, "matches")
+    if expand == "teams":
+        if fields:
+            projection.update({"home_team": 1, "away_team": 1})
+        pipeline = [
+            {"$match": query},
+            {"$skip": skip},
+            {"$limit": limit},
+            *team_lookup("home_team_id", "home_team"),
+            *team_lookup("away_team_id", "away_team"),
+            {"$project": projection},
+        ]
+        cursor = await db.matches.aggregate(pipeline, maxTimeMS=QUERY_TIMEOUT_MS, batchSize=limit)
+    else:
+        cursor = db.matches.find(query, projection).max_time_ms(QUERY_TIMEOUT_MS).skip(skip).limit(limit).batch_size(limit)
+    return await list_response(cursor, cache_key)
 
 
 @app.get("/matches/{match_id}")
-async def get_match(match_id: str):
+async def get_match(request: Request, match_id: PyObjectId):
     """Get a single match by ID."""
-    try:
-        match = await db.matches.find_one({"_id": ObjectId(match_id)})
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid match ID format")
+    cache_key, cached = await cached_response(request, "matches")
+    if cached is not None:
+        return cached
+
+    match = await db.matches.find_one({"_id": match_id}, HIDDEN_FIELDS["matches"])
     if not match:
         raise HTTPException(status_code=404, detail="Match not found")
-    return serialize_doc(match)
+    return await cache_response(cache_key, MongoJSONResponse(match))
 
 
 @app.post("/matches", status_code=201)
-async def create_match(match: MatchCreate):
+async def create_match(match: MatchCreate, created_at: datetime = Depends(now_utc)):
     """Create a new test match. is_test=True is automatically set."""
     match_dict = match.model_dump()
     match_dict["is_test"] = True
-    match_dict["created_at"] = datetime.utcnow()
-    result = await db.matches.insert_one(match_dict)
-    match_dict["_id"] = str(result.inserted_id)
-    return match_dict
+    match_dict["created_at"] = created_at
+    result = await db.matches.insert_one({**match_dict, **search_fields(match_dict, "matches")})
+    match_dict["_id"] = result.inserted_id
+    await invalidate_cache("matches")
+    return MongoJSONResponse(match_dict, status_code=201)
 
 
-@app.put("/matches/{match_id}")
-async def update_match(match_id: str, match: MatchUpdate):
-    """Update a match. Only test data can be modified."""
-    try:
-        existing = await db.matches.find_one({"_id": ObjectId(match_id)})
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid match ID format")
+@app.post("/matches/bulk", status_code=201)
+async def create_matches_bulk(
+    matches: List[MatchCreate] = Body(..., min_length=1, max_length=MAX_BULK_INSERT),
+    created_at: datetime = Depends(now_utc),
+):
+    """Create several test matches at once. is_test=True is automatically set."""
+    docs = [
+        {**add_search_fields(match.model_dump(), "matches"), "is_test": True, "created_at": created_at}
+        for match in matches
+    ]
+    return await insert_bulk("matches", docs, "matches")
 
-    if not existing:
-        raise HTTPException(status_code=404, detail="Match not found")
-    if not existing.get("is_test"):
-        raise HTTPException(status_code=403, detail="Cannot modify real data. Only test data can be updated.")
 
-    update_data = {k: v for k, v in match.model_dump().items() if v is not None}
+@app.put("/matches/{match_id}")
+async def update_match(
+    match_id: PyObjectId,
+    match: MatchUpdate,
+    updated_at: datetime = Depends(now_utc),
+):
+    """Update a match. Only test data can be modified."""
+    update_data = match.model_dump(exclude_unset=True, exclude_none=True)
     if update_data:
-        update_data["updated_at"] = datetime.utcnow()
-        await db.matches.update_one({"_id": ObjectId(match_id)}, {"$set": update_data})
-
-    updated = await db.matches.find_one({"_id": ObjectId(match_id)})
-    return serialize_doc(updated)
+        add_search_fields(update_data, "matches")
+        update_data["updated_at"] = updated_at
+        updated = await db.matches.find_one_and_update(
+            {"_id": match_id, "is_test": True},
+            {"$set": update_data},
+            projection=HIDDEN_FIELDS["matches"],
+            return_document=ReturnDocument.AFTER,
+        )
+    else:
+        updated = await db.matches.find_one({"_id": match_id, "is_test": True}, HIDDEN_FIELDS["matches"])
+
+    if not updated:
+        if not await db.matches.find_one({"_id": match_id}, ID_ONLY):
+            raise HTTPException(status_code=404, detail="Match not found")
+        raise HTTPException(status_code=403, detail="Cannot modify real data. Only test data can be updated.")
+    await invalidate_cache("matches")
+    return MongoJSONResponse(updated)
 
 
 @app.delete("/matches/{match_id}")
-async def delete_match(match_id: str):
+async def delete_match(match_id: PyObjectId):
     """Delete a match. Only test data can be deleted."""
-    try:
-        existing = await db.matches.find_one({"_id": ObjectId(match_id)})
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid match ID format")
-
-    if not existing:
-        raise HTTPException(status_code=404, detail="Match not found")
-    if not existing.get("is_test"):
+    deleted = await db.matches.find_one_and_delete({"_id": match_id, "is_test": True}, ID_ONLY)
+    if not deleted:
+        if not await db.matches.find_one({"_id": match_id}, ID_ONLY):
+            raise HTTPException(status_code=404, detail="Match not found")
         raise HTTPException(status_code=403, detail="Cannot delete real data. Only test data can be deleted.")
-
-    await db.matches.delete_one({"_id": ObjectId(match_id)})
+    await invalidate_cache("matches")
     return {"message": "Match deleted successfully"}
 
 
@@ -383,10 +933,13 @@ async def root():
 
 @app.delete("/cleanup/test-data")
 async def cleanup_test_data():
-    """Delete all test data from the database."""
-    players_result = await db.players.delete_many({"is_test": True})
-    teams_result = await db.teams.delete_many({"is_test": True})
-    matches_result = await db.matches.delete_many({"is_test": True})
+    """Delete all test data now, without waiting for the TTL purge."""
+    players_result, teams_result, matches_result = await asyncio.gather(
+        db.players.delete_many(TEST_DATA),
+        db.teams.delete_many(TEST_DATA),
+        db.matches.delete_many(TEST_DATA),
+    )
+    await invalidate_cache()
 
     return {
         "message": "Test data cleaned up",
@@ -396,3 +949,23 @@ async def cleanup_test_data():
             "matches": matches_result.deleted_count
         }
     }
+
+
+async def migrate(refresh):
+    mongo = AsyncMongoClient(MONGO_URL)
+    try:
+        await backfill_search_fields(mongo.football, refresh=refresh)
+    finally:
+        await mongo.close()
+
+
+if __name__ == "__main__":
+    # Real data is loaded outside the API, so loaders must fill the lowercase
+    # search fields afterwards, otherwise those documents cannot be found by
+    # the name/position/nationality/country/league/stadium filters:
+    #     python main.py backfill-search-fields [--refresh]
+    parser = argparse.ArgumentParser(description="Football API maintenance")
+    parser.add_argument("command", choices=["backfill-search-fields"])
+    parser.add_argument("--refresh", action="store_true", help="recompute fields that already exist")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.refresh))